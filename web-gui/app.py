@@ -2,32 +2,148 @@
 """
 Audiblez Web GUI - Flask Backend
 Provides web interface for converting ebooks to audiobooks
+
+Run under gunicorn with a single worker process (job state lives in memory):
+    gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:5000 --timeout 0 app:app
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
+from flask.json.provider import JSONProvider
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
+import orjson
 import os
 import subprocess
 import json
 import threading
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+import tempfile
 import time
+import traceback
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify and request.json"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
 app.config['EBOOK_FOLDER'] = '/ebooks'
 app.config['AUDIOBOOK_FOLDER'] = '/audiobooks'
 app.config['AUTO_CLEANUP'] = os.environ.get('AUTO_CLEANUP', 'true').lower() == 'true'
+app.config['CONVERSION_CONCURRENCY'] = int(os.environ.get('CONVERSION_CONCURRENCY', 2))
+app.config['FFMPEG_THREADS'] = os.environ.get('FFMPEG_THREADS', '2')
+app.config['STATUS_STREAM_LIMIT'] = int(os.environ.get('STATUS_STREAM_LIMIT', 6))
+
+# Seconds a cached ebook listing is trusted while the library folder's mtime is unchanged
+EBOOK_CACHE_TTL = 30
+
+# Seconds between keep-alive comments on idle status streams
+STATUS_STREAM_KEEPALIVE = 15
+
+# Each open status stream holds a server thread, so streams are capped in both
+# number and lifetime; EventSource reconnects after STATUS_STREAM_RETRY_MS
+STATUS_STREAM_MAX_AGE = 120
+STATUS_STREAM_RETRY_MS = 2000
+
+# Job states after which a job's status no longer changes
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Minimum seconds between status updates for unchanged progress
+STATUS_UPDATE_INTERVAL = 0.25
+
+# Size of each read when streaming request bodies to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MiB
+
+# Chunked uploads idle for longer than this are dropped along with their .part file
+UPLOAD_IDLE_TIMEOUT = 60 * 60
+
+# Minimum seconds between sweeps for abandoned chunked uploads
+UPLOAD_SWEEP_INTERVAL = 60
+
+CONTENT_RANGE_RE = re.compile(r'bytes (?:(\d+)-(\d+)|\*)/(\d+)')
+
+# Owner for finished audiobooks, looked up once instead of per file
+try:
+    import pwd
+    import grp
+    NOBODY_UID = pwd.getpwnam('nobody').pw_uid
+    USERS_GID = grp.getgrnam('users').gr_gid
+except (ImportError, KeyError):
+    NOBODY_UID = USERS_GID = None
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Global conversion status storage
+# conversion_lock only guards adding and removing jobs; each job's fields are
+# updated under its own lock in job_locks so readers and other jobs don't contend.
+# The per-job locks are Conditions so status streams can wait for changes.
 conversion_status = {}
 conversion_lock = threading.Lock()
+job_locks = {}
+
+# Bounded pool of conversion workers; extra jobs wait in 'pending' status
+conversion_executor = ThreadPoolExecutor(
+    max_workers=app.config['CONVERSION_CONCURRENCY'],
+    thread_name_prefix='conversion'
+)
+conversion_futures = {}
+
+
+def shutdown_conversions():
+    """
+    Stop conversions when the server exits instead of working through the queue.
+    Queued jobs are dropped and running ones are asked to stop at their next
+    progress event; the interpreter then waits only for those to wind down.
+    """
+    conversion_executor.shutdown(wait=False, cancel_futures=True)
+    
+    with conversion_lock:
+        jobs = [(conversion_status[job_id], lock) for job_id, lock in job_locks.items()]
+        conversion_futures.clear()
+    
+    for job, lock in jobs:
+        with lock:
+            if job.get('status') == 'pending':
+                job['status'] = 'cancelled'
+                job['end_time'] = datetime.now().isoformat()
+            elif job.get('status') == 'running':
+                job['cancel_requested'] = True
+            lock.notify_all()
+
+
+# atexit handlers only run after the interpreter has joined the pool's worker
+# threads, and concurrent.futures' own exit hook lets them drain every queued job.
+# threading's exit hooks run last-registered-first, so this one runs before it.
+threading._register_atexit(shutdown_conversions)
+
+# Last ebook listing, keyed on the library folder's mtime
+_ebook_cache = {'mtime': None, 'time': 0, 'data': []}
+
+# In-progress chunked uploads: upload_id -> {'filename', 'total', 'received', 'updated'}
+upload_status = {}
+upload_lock = threading.Lock()
+_last_upload_sweep = 0
+
+# Open /api/status/<job_id>/stream connections
+status_stream_slots = threading.BoundedSemaphore(app.config['STATUS_STREAM_LIMIT'])
 
 # Voice options by language
 VOICES = {
@@ -54,48 +170,95 @@ VOICES = {
 }
 
 
+def update_job(job_id, **fields):
+    """Apply field updates to a job under its own lock and wake any status streams"""
+    job = conversion_status.get(job_id)
+    lock = job_locks.get(job_id)
+    if job is None or lock is None:
+        return
+    with lock:
+        job.update(fields)
+        lock.notify_all()
+
+
+def snapshot_job(job_id):
+    """Return a consistent copy of a job's status, or None if it doesn't exist"""
+    job = conversion_status.get(job_id)
+    lock = job_locks.get(job_id)
+    if job is None or lock is None:
+        return None
+    with lock:
+        return dict(job)
+
+
 def get_ebook_files():
-    """Get list of epub files from the ebook folder"""
+    """
+    Get list of epub files from the ebook folder.
+    The listing is cached while the folder's mtime is unchanged, for at most
+    EBOOK_CACHE_TTL seconds so changes in nested folders are still picked up.
+    """
+    global _ebook_cache
     try:
-        ebook_path = Path(app.config['EBOOK_FOLDER'])
-        if not ebook_path.exists():
+        ebook_folder = app.config['EBOOK_FOLDER']
+        try:
+            mtime = os.stat(ebook_folder).st_mtime_ns
+        except FileNotFoundError:
             return []
         
+        cache = _ebook_cache
+        if cache['mtime'] == mtime and time.monotonic() - cache['time'] < EBOOK_CACHE_TTL:
+            return cache['data']
+        
         files = []
-        for file in ebook_path.rglob('*.epub'):
-            rel_path = file.relative_to(ebook_path)
-            files.append({
-                'name': file.name,
-                'path': str(file),
-                'relative_path': str(rel_path),
-                'size': file.stat().st_size,
-                'modified': datetime.fromtimestamp(file.stat().st_mtime).isoformat()
-            })
+        # Walk with scandir so DirEntry type checks don't need extra stat calls
+        pending_dirs = [ebook_folder]
+        while pending_dirs:
+            try:
+                entries = os.scandir(pending_dirs.pop())
+            except OSError:
+                # Skip unreadable folders rather than blanking the whole listing
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Skip hidden folders (.calibre, .Trash, ...) entirely
+                            if not entry.name.startswith('.'):
+                                pending_dirs.append(entry.path)
+                        elif entry.name.endswith('.epub') and entry.is_file():
+                            stat = entry.stat()
+                            files.append({
+                                'name': entry.name,
+                                'path': entry.path,
+                                'relative_path': os.path.relpath(entry.path, ebook_folder),
+                                'size': stat.st_size,
+                                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
+                            })
+                    except OSError:
+                        # e.g. a file removed mid-scan or a stale network mount entry
+                        continue
         
-        return sorted(files, key=lambda x: x['name'])
+        files.sort(key=lambda x: x['name'])
+        _ebook_cache = {'mtime': mtime, 'time': time.monotonic(), 'data': files}
+        return files
     except Exception as e:
         print(f"Error getting ebook files: {e}")
         return []
 
 
-def parse_progress_output(line):
-    """Parse progress and time remaining from audiblez output"""
-    progress_match = re.search(r'Progress:\s*(\d+)%', line)
-    time_match = re.search(r'Estimated time remaining:\s*(\d+)d\s*(\d+)h\s*(\d+)m\s*(\d+)s', line)
-    
-    result = {}
-    if progress_match:
-        result['progress'] = int(progress_match.group(1))
-    
-    if time_match:
-        days = int(time_match.group(1))
-        hours = int(time_match.group(2))
-        minutes = int(time_match.group(3))
-        seconds = int(time_match.group(4))
-        result['time_remaining'] = f"{days}d {hours}h {minutes}m {seconds}s"
-        result['time_remaining_seconds'] = days * 86400 + hours * 3600 + minutes * 60 + seconds
-    
-    return result
+def probe_duration(file_path):
+    """Return a media file's duration in seconds using ffprobe, or None if unknown"""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=nw=1:nk=1', file_path],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
 
 
 def cleanup_temporary_files(output_folder, epub_name):
@@ -104,43 +267,50 @@ def cleanup_temporary_files(output_folder, epub_name):
     Keeps only .m4b files and removes .wav, .txt, cover files, and other temporary files.
     """
     try:
-        output_path = Path(output_folder)
-        if not output_path.exists():
+        if not os.path.isdir(output_folder):
             return 0
         
         # Get the base name of the epub file (without extension)
-        base_name = Path(epub_name).stem
-        
-        deleted_count = 0
-        deleted_size = 0
+        base_name = os.path.splitext(epub_name)[0]
         
         # Find all files in the output directory related to this conversion
-        for file in output_path.iterdir():
-            if file.is_file():
+        to_delete = []
+        with os.scandir(output_folder) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                
                 # Check if file is related to this conversion
                 # and is NOT an m4b file
                 # Also remove cover files and chapters.txt
+                name = entry.name
                 should_delete = False
                 
-                if file.stem.startswith(base_name) and file.suffix != '.m4b':
+                if name.rsplit('.', 1)[0].startswith(base_name) and not name.endswith('.m4b'):
                     should_delete = True
-                elif file.name == 'cover' or file.name.startswith('cover.'):
+                elif name == 'cover' or name.startswith('cover.'):
                     should_delete = True
-                elif file.name == 'chapters.txt':
+                elif name == 'chapters.txt':
                     should_delete = True
                 
                 if should_delete:
-                    file_size = file.stat().st_size
-                    try:
-                        file.unlink()
-                        deleted_count += 1
-                        deleted_size += file_size
-                        print(f"Deleted temporary file: {file.name} ({file_size} bytes)")
-                    except Exception as e:
-                        print(f"Failed to delete {file.name}: {e}")
+                    to_delete.append(entry.path)
         
-        if deleted_count > 0:
-            print(f"Cleanup complete: Deleted {deleted_count} temporary files ({deleted_size / 1024 / 1024:.2f} MB)")
+        # Sizes were only ever logged, so skip stat() and just unlink
+        deleted_count = 0
+        failed = []
+        for path in to_delete:
+            try:
+                os.unlink(path)
+                deleted_count += 1
+            except OSError:
+                failed.append(os.path.basename(path))
+        
+        # One summary line rather than a line per file
+        if deleted_count > 0 or failed:
+            print(f"Cleanup complete: Deleted {deleted_count} temporary files, failures={len(failed)}")
+        if failed:
+            print(f"Failed to delete: {', '.join(failed)}")
         
         return deleted_count
     
@@ -154,21 +324,16 @@ def set_file_permissions(file_path):
     Set file permissions to 777 (rwxrwxrwx) and ownership to nobody:users.
     """
     try:
-        import pwd
-        import grp
-        
         # Set permissions to 777
         os.chmod(file_path, 0o777)
         
-        # Try to set ownership to nobody:users
-        try:
-            nobody_uid = pwd.getpwnam('nobody').pw_uid
-            users_gid = grp.getgrnam('users').gr_gid
-            os.chown(file_path, nobody_uid, users_gid)
-            print(f"Set permissions for {Path(file_path).name}: rwxrwxrwx nobody:users")
-        except (KeyError, PermissionError) as e:
-            # If we can't set ownership (not running as root), just set permissions
-            print(f"Set permissions for {Path(file_path).name}: rwxrwxrwx (ownership unchanged: {e})")
+        # Try to set ownership to nobody:users, if those accounts exist
+        if NOBODY_UID is not None and USERS_GID is not None:
+            try:
+                os.chown(file_path, NOBODY_UID, USERS_GID)
+            except PermissionError as e:
+                # If we can't set ownership (not running as root), just set permissions
+                print(f"Set permissions for {Path(file_path).name}: rwxrwxrwx (ownership unchanged: {e})")
     
     except Exception as e:
         print(f"Failed to set permissions for {Path(file_path).name}: {e}")
@@ -193,54 +358,69 @@ def compress_m4b(job_id, m4b_path, bitrate='64k'):
         print(f"Compressing {m4b_file.name} at {bitrate}...")
         
         # Update status to show compression started
-        with conversion_lock:
-            conversion_status[job_id]['compression_progress'] = 0
+        update_job(job_id, compression_progress=0)
+        
+        # Total duration up front, so progress can be computed from out_time_us
+        duration = probe_duration(str(m4b_file))
         
         # Run ffmpeg compression with cover art preservation
         # -map 0:a maps audio stream
         # -map 0:v? maps video stream (cover art) if it exists (? makes it optional)
         # -c:v copy copies the cover art without re-encoding
-        process = subprocess.Popen(
-            [
-                'ffmpeg', '-i', str(m4b_file),
-                '-map', '0:a',      # Map audio stream
-                '-map', '0:v?',     # Map video/cover stream if exists (optional)
-                '-c:a', 'aac',      # Audio codec
-                '-b:a', bitrate,    # Audio bitrate
-                '-c:v', 'copy',     # Copy cover art without re-encoding
-                str(compressed_path),
-                '-y'  # Overwrite output file if exists
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
+        # -threads caps decoder and encoder threads so parallel jobs don't oversubscribe the CPU
+        # -progress writes key=value lines (out_time_us=...) to a dedicated pipe
+        threads = app.config['FFMPEG_THREADS']
+        progress_read, progress_write = os.pipe()
+        try:
+            process = subprocess.Popen(
+                [
+                    'ffmpeg',
+                    '-threads', threads,  # Input (decoder) threads
+                    '-i', str(m4b_file),
+                    '-map', '0:a',      # Map audio stream
+                    '-map', '0:v?',     # Map video/cover stream if exists (optional)
+                    '-c:a', 'aac',      # Audio codec
+                    '-b:a', bitrate,    # Audio bitrate
+                    '-c:v', 'copy',     # Copy cover art without re-encoding
+                    '-threads', threads,  # Output (encoder) threads
+                    '-nostats',
+                    '-progress', f'pipe:{progress_write}',
+                    str(compressed_path),
+                    '-y'  # Overwrite output file if exists
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(progress_write,)
+            )
+        except Exception:
+            os.close(progress_read)
+            raise
+        finally:
+            # Only ffmpeg holds the write end now, so the read ends when it exits
+            os.close(progress_write)
         
-        # Monitor ffmpeg output for progress
-        duration = None
-        for line in process.stdout:
-            # Try to extract duration
-            if duration is None and 'Duration:' in line:
-                duration_match = re.search(r'Duration: (\d+):(\d+):(\d+\.\d+)', line)
-                if duration_match:
-                    hours = int(duration_match.group(1))
-                    minutes = int(duration_match.group(2))
-                    seconds = float(duration_match.group(3))
-                    duration = hours * 3600 + minutes * 60 + seconds
-            
-            # Extract current time position
-            if duration and 'time=' in line:
-                time_match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', line)
-                if time_match:
-                    hours = int(time_match.group(1))
-                    minutes = int(time_match.group(2))
-                    seconds = float(time_match.group(3))
-                    current_time = hours * 3600 + minutes * 60 + seconds
-                    progress = min(int((current_time / duration) * 100), 99)
-                    
-                    with conversion_lock:
-                        conversion_status[job_id]['compression_progress'] = progress
+        # Lower ffmpeg's priority from here; preexec_fn isn't safe in a threaded process
+        try:
+            os.setpriority(os.PRIO_PROCESS, process.pid, 10)
+        except OSError:
+            pass  # Already exited, or not permitted
+        
+        # Monitor the -progress stream
+        last_progress = 0
+        with os.fdopen(progress_read, 'rb') as progress_pipe:
+            for line in progress_pipe:
+                key, _, value = line.partition(b'=')
+                if key != b'out_time_us' or not duration:
+                    continue
+                try:
+                    current_time = int(value) / 1_000_000
+                except ValueError:
+                    continue  # N/A before the first packet is written
+                progress = min(int((current_time / duration) * 100), 99)
+                
+                if progress != last_progress:
+                    update_job(job_id, compression_progress=progress)
+                    last_progress = progress
         
         return_code = process.wait()
         
@@ -268,127 +448,175 @@ def compress_m4b(job_id, m4b_path, bitrate='64k'):
         return False, 0, 0, str(e)
 
 
+class ConversionCancelled(Exception):
+    """Raised from the audiblez progress callback to stop a cancelled job"""
+
+
+def format_time_remaining(seconds):
+    """Format seconds the way audiblez reports its ETA"""
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
 def run_conversion(job_id, epub_path, voice, speed, use_cuda, use_compress, output_folder):
-    """Run the audiblez conversion in a separate thread"""
-    
-    # Build command
-    cmd = ['audiblez', epub_path]
-    
-    if voice:
-        cmd.extend(['-v', voice])
-    
-    if speed:
-        cmd.extend(['-s', str(speed)])
-    
-    if use_cuda:
-        cmd.append('-c')
-    
-    if output_folder:
-        cmd.extend(['-o', output_folder])
+    """
+    Run the audiblez conversion in-process on a pool worker thread.
+    audiblez and its torch/kokoro/spacy dependencies are imported once and stay
+    loaded for later jobs instead of being re-imported by a new process each time.
+    """
     
-    # Update status to running
+    # Update status to running, unless the job was removed while queued
     with conversion_lock:
-        conversion_status[job_id]['status'] = 'running'
-        conversion_status[job_id]['command'] = ' '.join(cmd)
-        conversion_status[job_id]['start_time'] = datetime.now().isoformat()
+        conversion_futures.pop(job_id, None)
+        job = conversion_status.get(job_id)
+        lock = job_locks.get(job_id)
+    if job is None:
+        return
+    with lock:
+        if job['status'] != 'pending':
+            return
+        job['status'] = 'running'
+        job['start_time'] = datetime.now().isoformat()
+        lock.notify_all()
     
     try:
-        # Run the process
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
+        import torch
+        from audiblez.core import main as audiblez_main
         
-        # Store process ID
-        with conversion_lock:
-            conversion_status[job_id]['pid'] = process.pid
+        # The default device is per thread, so each worker sets its own
+        if use_cuda and torch.cuda.is_available():
+            torch.set_default_device('cuda')
+        else:
+            if use_cuda:
+                print('CUDA GPU not available. Defaulting to CPU')
+            torch.set_default_device('cpu')
         
-        # Read output line by line
-        for line in process.stdout:
-            line = line.strip()
-            if line:
-                # Parse progress information
-                progress_info = parse_progress_output(line)
-                
-                with conversion_lock:
-                    conversion_status[job_id]['last_output'] = line
-                    if progress_info:
-                        conversion_status[job_id].update(progress_info)
+        # Progress arrives through audiblez's post_event callback; publish it to
+        # the shared status only when it changes or STATUS_UPDATE_INTERVAL has passed
+        last_progress = None
+        last_update_ts = 0
+        finished = False
         
-        # Wait for process to complete
-        return_code = process.wait()
+        def post_event(event_name, **kwargs):
+            nonlocal last_progress, last_update_ts, finished
+            # Cancellation is cooperative: stop at the next event
+            if job.get('cancel_requested'):
+                raise ConversionCancelled()
+            
+            if event_name == 'CORE_FINISHED':
+                finished = True
+            elif event_name == 'CORE_PROGRESS':
+                stats = kwargs['stats']
+                now = time.monotonic()
+                if stats.progress != last_progress or now - last_update_ts > STATUS_UPDATE_INTERVAL:
+                    remaining = int((stats.total_chars - stats.processed_chars) / stats.chars_per_sec)
+                    update_job(
+                        job_id,
+                        progress=stats.progress,
+                        time_remaining=format_time_remaining(remaining),
+                        time_remaining_seconds=remaining,
+                        last_output=f"Progress: {stats.progress}%"
+                    )
+                    last_progress = stats.progress
+                    last_update_ts = now
+        
+        audiblez_main(
+            epub_path, voice, pick_manually=False, speed=speed,
+            output_folder=output_folder or '.', post_event=post_event
+        )
+        
+        # Cancelled after the last progress event; don't go on to compress
+        if job.get('cancel_requested'):
+            raise ConversionCancelled()
+        
+        epub_name = Path(epub_path).stem
+        success = finished and (Path(output_folder or '.') / f"{epub_name}.m4b").exists()
         
         # Update final status
-        with conversion_lock:
-            if return_code == 0:
-                conversion_status[job_id]['status'] = 'completed'
-                conversion_status[job_id]['progress'] = 100
-                
-                # Mark for compression if requested
-                should_compress = use_compress
-        
-        # Compress M4B if requested (outside lock to avoid blocking)
-        if return_code == 0 and should_compress:
-            with conversion_lock:
-                conversion_status[job_id]['status'] = 'compressing'
-                conversion_status[job_id]['compression_progress'] = 0
+        # Status only becomes 'completed' once compression and cleanup are done
+        should_compress = use_compress
+        if success:
+            update_job(job_id, progress=100)
+        
+        # Compress M4B if requested
+        if success and should_compress:
+            update_job(job_id, status='compressing', compression_progress=0)
             
             # Find the M4B file
             epub_name = Path(epub_path).stem
             m4b_file = Path(output_folder) / f"{epub_name}.m4b"
             
             if m4b_file.exists():
-                success, original_size, compressed_size, error = compress_m4b(job_id, str(m4b_file))
+                compressed, original_size, compressed_size, error = compress_m4b(job_id, str(m4b_file))
                 
-                with conversion_lock:
-                    if success:
-                        conversion_status[job_id]['compressed'] = True
-                        conversion_status[job_id]['original_size'] = original_size
-                        conversion_status[job_id]['compressed_size'] = compressed_size
-                        reduction = ((original_size - compressed_size) / original_size) * 100
-                        conversion_status[job_id]['compression_reduction'] = round(reduction, 1)
-                        conversion_status[job_id]['compression_progress'] = 100
-                    else:
-                        conversion_status[job_id]['compressed'] = False
-                        conversion_status[job_id]['compression_error'] = error
+                if compressed:
+                    reduction = ((original_size - compressed_size) / original_size) * 100
+                    update_job(
+                        job_id,
+                        compressed=True,
+                        original_size=original_size,
+                        compressed_size=compressed_size,
+                        compression_reduction=round(reduction, 1),
+                        compression_progress=100
+                    )
+                else:
+                    update_job(job_id, compressed=False, compression_error=error)
             else:
-                with conversion_lock:
-                    conversion_status[job_id]['compressed'] = False
-                    conversion_status[job_id]['compression_error'] = "M4B file not found"
+                update_job(job_id, compressed=False, compression_error="M4B file not found")
         
         # If compression was NOT used, set permissions on the original M4B file
-        if return_code == 0 and not should_compress:
+        if success and not should_compress:
             epub_name = Path(epub_path).stem
             m4b_file = Path(output_folder) / f"{epub_name}.m4b"
             if m4b_file.exists():
                 set_file_permissions(str(m4b_file))
         
         # Clean up temporary files and finalize (if successful)
-        with conversion_lock:
-            if return_code == 0:
-                conversion_status[job_id]['status'] = 'completed'
-                
-                # Auto cleanup
-                if app.config['AUTO_CLEANUP']:
-                    epub_name = Path(epub_path).name
-                    deleted_count = cleanup_temporary_files(output_folder, epub_name)
-                    conversion_status[job_id]['cleanup_files_deleted'] = deleted_count
-                else:
-                    conversion_status[job_id]['cleanup_files_deleted'] = 0
+        if success:
+            # Auto cleanup
+            if app.config['AUTO_CLEANUP']:
+                epub_name = Path(epub_path).name
+                deleted_count = cleanup_temporary_files(output_folder, epub_name)
             else:
-                conversion_status[job_id]['status'] = 'failed'
-                conversion_status[job_id]['error'] = f"Process exited with code {return_code}"
+                deleted_count = 0
             
-            conversion_status[job_id]['end_time'] = datetime.now().isoformat()
+            update_job(
+                job_id,
+                status='completed',
+                cleanup_files_deleted=deleted_count,
+                end_time=datetime.now().isoformat()
+            )
+        else:
+            update_job(
+                job_id,
+                status='failed',
+                error="Audiobook file was not created",
+                end_time=datetime.now().isoformat()
+            )
+    
+    except ConversionCancelled:
+        print(f"Conversion cancelled: {job_id}")
+        # Remove the partial output so the job state matches what is on disk
+        cleanup_temporary_files(output_folder or '.', Path(epub_path).name)
+        m4b_file = Path(output_folder or '.') / f"{Path(epub_path).stem}.m4b"
+        try:
+            m4b_file.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not delete {m4b_file}: {e}")
+        update_job(job_id, status='cancelled', end_time=datetime.now().isoformat())
+    
+    except SystemExit as e:
+        # audiblez can sys.exit() (e.g. a failed spacy model download); don't let it strand the job
+        traceback.print_exc()
+        update_job(job_id, status='failed', error=f"audiblez exited with code {e.code}", end_time=datetime.now().isoformat())
     
     except Exception as e:
-        with conversion_lock:
-            conversion_status[job_id]['status'] = 'failed'
-            conversion_status[job_id]['error'] = str(e)
-            conversion_status[job_id]['end_time'] = datetime.now().isoformat()
+        traceback.print_exc()
+        update_job(job_id, status='failed', error=str(e), end_time=datetime.now().isoformat())
 
 
 @app.route('/')
@@ -410,24 +638,59 @@ def list_ebooks():
     return jsonify(files)
 
 
-@app.route('/api/upload', methods=['POST'])
+def save_stream(stream, filepath):
+    """
+    Write a request body stream to disk in fixed-size chunks.
+    Avoids the multipart parser spooling the whole upload before it is copied.
+    The body goes to a temporary .part file that only replaces filepath once it
+    is complete, so a failed upload never clobbers an earlier file of the same name.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix='.part')
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp creates 0600; match a normally created file
+        with os.fdopen(fd, 'wb') as f:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        # Don't leave a truncated upload behind
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@app.route('/api/upload', methods=['POST', 'PUT'])
 def upload_file():
-    """Upload an epub file"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
+    """
+    Upload an epub file.
+    Accepts either a raw application/octet-stream body (filename given by the
+    'filename' query argument or X-Filename header) or a multipart form.
+    """
+    if request.mimetype == 'application/octet-stream':
+        original_name = request.args.get('filename') or request.headers.get('X-Filename', '')
+        file = None
+    else:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        original_name = file.filename
     
-    if file.filename == '':
+    if original_name == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    if not file.filename.endswith('.epub'):
+    if not original_name.endswith('.epub'):
         return jsonify({'error': 'Only .epub files are allowed'}), 400
     
     try:
-        filename = secure_filename(file.filename)
+        filename = secure_filename(original_name)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        if file is None:
+            save_stream(request.stream, filepath)
+        else:
+            file.save(filepath)
         
         return jsonify({
             'success': True,
@@ -435,6 +698,161 @@ def upload_file():
             'filepath': filepath
         })
     
+    except HTTPException:
+        # e.g. RequestEntityTooLarge raised while reading the stream
+        raise
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def write_stream_at(stream, filepath, offset):
+    """Write a request body stream into an existing file starting at offset"""
+    fd = os.open(filepath, os.O_RDWR | os.O_CREAT, 0o644)
+    written = 0
+    with os.fdopen(fd, 'r+b') as f:
+        f.seek(offset)
+        while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def upload_incomplete_response(received):
+    """308 Resume Incomplete response advertising the bytes received so far"""
+    response = jsonify({'success': True, 'complete': False, 'received': received})
+    response.status_code = 308
+    if received > 0:
+        response.headers['Range'] = f"bytes=0-{received - 1}"
+    return response
+
+
+def expire_stale_uploads():
+    """
+    Forget chunked uploads idle for longer than UPLOAD_IDLE_TIMEOUT and delete
+    their .part files, including ones left over from before a restart.
+    """
+    global _last_upload_sweep
+    now = time.monotonic()
+    with upload_lock:
+        if now - _last_upload_sweep < UPLOAD_SWEEP_INTERVAL:
+            return
+        _last_upload_sweep = now
+        stale_ids = [
+            upload_id for upload_id, upload in upload_status.items()
+            if now - upload['updated'] > UPLOAD_IDLE_TIMEOUT
+        ]
+        for upload_id in stale_ids:
+            del upload_status[upload_id]
+        active_parts = {f"{upload_id}.part" for upload_id in upload_status}
+    
+    cutoff = time.time() - UPLOAD_IDLE_TIMEOUT
+    removed = 0
+    try:
+        with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.part') or entry.name in active_parts:
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff or entry.name[:-len('.part')] in stale_ids:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Error expiring uploads: {e}")
+    
+    if removed:
+        print(f"Expired {removed} abandoned uploads")
+
+
+@app.route('/api/upload/chunk', methods=['POST', 'PUT'])
+def upload_chunk():
+    """
+    Upload one chunk of an epub file.
+    Expects 'Content-Range: bytes start-end/total' and an X-Upload-Id header;
+    the filename is taken from the 'filename' query argument or X-Filename header.
+    A 'bytes */total' range with no body just reports how much has been received.
+    Responds 308 with a Range header until the final byte arrives.
+    """
+    upload_id = secure_filename(request.headers.get('X-Upload-Id', ''))
+    if not upload_id:
+        return jsonify({'error': 'Missing X-Upload-Id header'}), 400
+    
+    range_match = CONTENT_RANGE_RE.fullmatch(request.headers.get('Content-Range', ''))
+    if not range_match:
+        return jsonify({'error': 'Missing or invalid Content-Range header'}), 400
+    
+    total = int(range_match.group(3))
+    if total > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'File too large'}), 413
+    
+    expire_stale_uploads()
+    
+    with upload_lock:
+        upload = upload_status.get(upload_id)
+        if upload is None:
+            original_name = request.args.get('filename') or request.headers.get('X-Filename', '')
+            if not original_name.endswith('.epub'):
+                return jsonify({'error': 'Only .epub files are allowed'}), 400
+            upload = {
+                'filename': secure_filename(original_name),
+                'total': total,
+                'received': 0
+            }
+            upload_status[upload_id] = upload
+        elif upload['total'] != total:
+            return jsonify({'error': 'Total size does not match earlier chunks'}), 400
+        upload['updated'] = time.monotonic()
+        received = upload['received']
+    
+    part_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{upload_id}.part")
+    
+    if range_match.group(1) is None:
+        return upload_incomplete_response(received)
+    
+    start = int(range_match.group(1))
+    end = int(range_match.group(2))
+    if end < start or end >= total:
+        return jsonify({'error': 'Invalid Content-Range'}), 416
+    
+    # Chunks must not leave a gap; the client resumes from the Range we report
+    if start > received:
+        return upload_incomplete_response(received)
+    
+    try:
+        written = write_stream_at(request.stream, part_path, start)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if written != end - start + 1:
+        return upload_incomplete_response(received)
+    
+    with upload_lock:
+        upload['updated'] = time.monotonic()
+        upload['received'] = max(upload['received'], end + 1)
+        received = upload['received']
+        complete = received >= total and upload_status.pop(upload_id, None) is not None
+    
+    if not complete:
+        return upload_incomplete_response(received)
+    
+    try:
+        with open(part_path, 'rb+') as f:
+            f.truncate(total)
+            os.fsync(f.fileno())
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], upload['filename'])
+        os.rename(part_path, filepath)
+        
+        return jsonify({
+            'success': True,
+            'complete': True,
+            'filename': upload['filename'],
+            'filepath': filepath
+        })
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -446,8 +864,8 @@ def convert_ebook():
     
     # Get parameters
     epub_path = data.get('epub_path')
-    voice = data.get('voice', 'af_sky')
-    speed = data.get('speed', 1.0)
+    voice = data.get('voice') or 'af_sky'
+    speed = data.get('speed') or 1.0
     use_cuda = data.get('use_cuda', False)
     use_compress = data.get('compress', True)
     output_folder = data.get('output_folder', app.config['AUDIOBOOK_FOLDER'])
@@ -458,11 +876,24 @@ def convert_ebook():
     if not os.path.exists(epub_path):
         return jsonify({'error': 'Epub file not found'}), 404
     
+    # Reject bad options here rather than failing later on the worker
+    if not any(voice in voices for voices in VOICES.values()):
+        return jsonify({'error': f'Unknown voice: {voice}'}), 400
+    
+    try:
+        speed = float(speed)
+    except (TypeError, ValueError):
+        return jsonify({'error': f'Invalid speed: {speed}'}), 400
+    
+    if not 0 < speed < float('inf'):
+        return jsonify({'error': f'Invalid speed: {speed}'}), 400
+    
     # Generate job ID
     job_id = f"{Path(epub_path).stem}_{int(time.time())}"
     
-    # Initialize job status
+    # Initialize job status and queue conversion on the bounded worker pool
     with conversion_lock:
+        job_locks[job_id] = threading.Condition()
         conversion_status[job_id] = {
             'job_id': job_id,
             'epub_path': epub_path,
@@ -476,14 +907,10 @@ def convert_ebook():
             'output_folder': output_folder,
             'created_time': datetime.now().isoformat()
         }
-    
-    # Start conversion in background thread
-    thread = threading.Thread(
-        target=run_conversion,
-        args=(job_id, epub_path, voice, speed, use_cuda, use_compress, output_folder)
-    )
-    thread.daemon = True
-    thread.start()
+        conversion_futures[job_id] = conversion_executor.submit(
+            run_conversion,
+            job_id, epub_path, voice, speed, use_cuda, use_compress, output_folder
+        )
     
     return jsonify({
         'success': True,
@@ -494,18 +921,65 @@ def convert_ebook():
 @app.route('/api/status/<job_id>')
 def get_status(job_id):
     """Get conversion status for a specific job"""
-    with conversion_lock:
-        if job_id not in conversion_status:
-            return jsonify({'error': 'Job not found'}), 404
-        
-        return jsonify(conversion_status[job_id])
+    job = snapshot_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job)
+
+
+@app.route('/api/status/<job_id>/stream')
+def stream_status(job_id):
+    """
+    Push status updates for a job as Server-Sent Events.
+    A new event is sent whenever the job changes; the stream ends once the job
+    finishes or is deleted, or after STATUS_STREAM_MAX_AGE so the client
+    reconnects and the server thread is released in between.
+    At most STATUS_STREAM_LIMIT streams are open at once; beyond that clients
+    get 503 and fall back to polling /api/jobs.
+    """
+    job = conversion_status.get(job_id)
+    lock = job_locks.get(job_id)
+    if job is None or lock is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not status_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many status streams'}), 503
+    
+    def generate():
+        deadline = time.monotonic() + STATUS_STREAM_MAX_AGE
+        yield f"retry: {STATUS_STREAM_RETRY_MS}\n\n"
+        last_sent = None
+        while time.monotonic() < deadline:
+            with lock:
+                if job == last_sent:
+                    lock.wait(timeout=STATUS_STREAM_KEEPALIVE)
+                snapshot = dict(job)
+            
+            if job_id not in conversion_status:
+                return
+            
+            if snapshot != last_sent:
+                yield f"data: {app.json.dumps(snapshot)}\n\n"
+                last_sent = snapshot
+            else:
+                yield ": keep-alive\n\n"
+            
+            if snapshot['status'] in FINAL_STATUSES:
+                return
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Released when the server closes the response, even if the generator never started
+    response.call_on_close(status_stream_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a reverse proxy buffer events
+    return response
 
 
 @app.route('/api/jobs')
 def list_jobs():
     """List all conversion jobs"""
-    with conversion_lock:
-        jobs = list(conversion_status.values())
+    jobs = [job for job in map(snapshot_job, list(conversion_status)) if job is not None]
     
     # Sort by creation time, newest first
     jobs.sort(key=lambda x: x.get('created_time', ''), reverse=True)
@@ -516,27 +990,30 @@ def list_jobs():
 @app.route('/api/cancel/<job_id>', methods=['POST'])
 def cancel_job(job_id):
     """Cancel a running conversion job"""
-    with conversion_lock:
-        if job_id not in conversion_status:
-            return jsonify({'error': 'Job not found'}), 404
-        
-        job = conversion_status[job_id]
+    job = conversion_status.get(job_id)
+    lock = job_locks.get(job_id)
+    if job is None or lock is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    with lock:
+        if job['status'] == 'pending':
+            # Still queued: drop it before a worker picks it up
+            future = conversion_futures.pop(job_id, None)
+            if future:
+                future.cancel()
+            job['status'] = 'cancelled'
+            job['end_time'] = datetime.now().isoformat()
+            lock.notify_all()
+            return jsonify({'success': True, 'status': 'cancelled'})
         
         if job['status'] != 'running':
             return jsonify({'error': 'Job is not running'}), 400
         
-        pid = job.get('pid')
-        
-        if pid:
-            try:
-                os.kill(pid, 15)  # SIGTERM
-                job['status'] = 'cancelled'
-                job['end_time'] = datetime.now().isoformat()
-                return jsonify({'success': True})
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
-        else:
-            return jsonify({'error': 'No process ID found'}), 500
+        # The worker stops at its next progress event, removes its partial
+        # output and only then marks the job cancelled
+        job['cancel_requested'] = True
+        lock.notify_all()
+        return jsonify({'success': True, 'status': 'cancelling'})
 
 
 @app.route('/api/delete/<job_id>', methods=['DELETE'])
@@ -547,6 +1024,15 @@ def delete_job(job_id):
             return jsonify({'error': 'Job not found'}), 404
         
         del conversion_status[job_id]
+        lock = job_locks.pop(job_id, None)
+        future = conversion_futures.pop(job_id, None)
+        if future:
+            future.cancel()
+    
+    # Let any open status stream notice the job is gone
+    if lock is not None:
+        with lock:
+            lock.notify_all()
     
     return jsonify({'success': True})
 
@@ -554,11 +1040,15 @@ def delete_job(job_id):
 @app.route('/health')
 def health():
     """Health check endpoint"""
+    statuses = [job['status'] for job in map(snapshot_job, list(conversion_status)) if job is not None]
+    
     return jsonify({
         'status': 'healthy',
         'ebook_folder': app.config['EBOOK_FOLDER'],
         'audiobook_folder': app.config['AUDIOBOOK_FOLDER'],
-        'active_jobs': len([j for j in conversion_status.values() if j['status'] == 'running']),
+        'active_jobs': statuses.count('running') + statuses.count('compressing'),
+        'queued_jobs': statuses.count('pending'),
+        'max_concurrent_jobs': app.config['CONVERSION_CONCURRENCY'],
         'auto_cleanup': app.config['AUTO_CLEANUP']
     })
 
@@ -575,15 +1065,16 @@ def cleanup_all():
         deleted_size = 0
         
         # Remove all non-.m4b files
-        for file in output_path.iterdir():
-            if file.is_file() and file.suffix != '.m4b':
-                file_size = file.stat().st_size
-                try:
-                    file.unlink()
-                    deleted_count += 1
-                    deleted_size += file_size
-                except Exception as e:
-                    print(f"Failed to delete {file.name}: {e}")
+        with os.scandir(output_path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and not entry.name.endswith('.m4b'):
+                    file_size = entry.stat().st_size
+                    try:
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                        deleted_size += file_size
+                    except Exception as e:
+                        print(f"Failed to delete {entry.name}: {e}")
         
         return jsonify({
             'success': True,
@@ -598,19 +1089,16 @@ def cleanup_all():
 @app.route('/api/cleanup/job/<job_id>', methods=['POST'])
 def cleanup_job(job_id):
     """Manually clean up temporary files for a specific job"""
-    with conversion_lock:
-        if job_id not in conversion_status:
-            return jsonify({'error': 'Job not found'}), 404
-        
-        job = conversion_status[job_id]
+    job = snapshot_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
     
     try:
         epub_name = Path(job['epub_path']).name
         output_folder = job['output_folder']
         deleted_count = cleanup_temporary_files(output_folder, epub_name)
         
-        with conversion_lock:
-            conversion_status[job_id]['cleanup_files_deleted'] = deleted_count
+        update_job(job_id, cleanup_files_deleted=deleted_count)
         
         return jsonify({
             'success': True,
@@ -634,22 +1122,26 @@ def cleanup_status():
         m4b_files = []
         m4b_size = 0
         
-        for file in output_path.iterdir():
-            if file.is_file():
-                file_size = file.stat().st_size
-                if file.suffix == '.m4b':
+        with os.scandir(output_path) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                
+                stat = entry.stat()
+                file_size = stat.st_size
+                if entry.name.endswith('.m4b'):
                     m4b_files.append({
-                        'name': file.name,
+                        'name': entry.name,
                         'size': file_size,
-                        'modified': datetime.fromtimestamp(file.stat().st_mtime).isoformat()
+                        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
                     })
                     m4b_size += file_size
                 else:
                     temp_files.append({
-                        'name': file.name,
+                        'name': entry.name,
                         'size': file_size,
-                        'extension': file.suffix,
-                        'modified': datetime.fromtimestamp(file.stat().st_mtime).isoformat()
+                        'extension': os.path.splitext(entry.name)[1],
+                        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
                     })
                     temp_size += file_size
         
@@ -690,4 +1182,5 @@ def config_cleanup():
 
 
 if __name__ == '__main__':
+    # Development server only; use gunicorn in production (see module docstring)
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -4,6 +4,16 @@ let selectedFile = null;
 let selectedLibraryFile = null;
 let currentJobs = [];
 let jobRefreshInterval = null;
+let jobStreams = {};
+
+// Jobs whose status is pushed over Server-Sent Events while the jobs tab is open
+const STREAMED_JOB_STATUSES = ['running', 'compressing'];
+// Slow full refresh to pick up new and newly started jobs
+const JOB_LIST_REFRESH_MS = 10000;
+
+// Files larger than this are uploaded in resumable chunks
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_CHUNK_RETRIES = 3;
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', function() {
@@ -133,14 +143,20 @@ async function handleFileSelect(file) {
 
     showToast('Uploading file...', 'warning');
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-        const response = await fetch('/api/upload', {
-            method: 'POST',
-            body: formData
-        });
+        let response;
+        if (file.size > UPLOAD_CHUNK_SIZE) {
+            response = await uploadInChunks(file);
+        } else {
+            // Send the raw file body so the server can stream it straight to disk
+            response = await fetch('/api/upload?filename=' + encodeURIComponent(file.name), {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream'
+                },
+                body: file
+            });
+        }
 
         const data = await response.json();
 
@@ -159,6 +175,54 @@ async function handleFileSelect(file) {
     }
 }
 
+// Upload a file in Content-Range chunks, resuming from the server's Range on failure
+async function uploadInChunks(file) {
+    const uploadId = `${Date.now()}_${Math.random().toString(36).slice(2)}`;
+    const url = '/api/upload/chunk?filename=' + encodeURIComponent(file.name);
+    let offset = 0;
+    let retries = 0;
+
+    while (true) {
+        const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size) - 1;
+        let response;
+        try {
+            response = await fetch(url, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Range': `bytes ${offset}-${end}/${file.size}`,
+                    'X-Upload-Id': uploadId
+                },
+                body: file.slice(offset, end + 1)
+            });
+        } catch (error) {
+            if (++retries > UPLOAD_CHUNK_RETRIES) throw error;
+            // Ask the server how much it has before retrying
+            response = await fetch(url, {
+                method: 'PUT',
+                headers: {
+                    'Content-Range': `bytes */${file.size}`,
+                    'X-Upload-Id': uploadId
+                }
+            });
+        }
+
+        if (response.status !== 308) {
+            return response;
+        }
+
+        const range = response.headers.get('Range');
+        const nextOffset = range ? parseInt(range.split('-')[1], 10) + 1 : 0;
+        if (nextOffset > offset) {
+            retries = 0;
+        } else if (++retries > UPLOAD_CHUNK_RETRIES) {
+            throw new Error('Upload stalled');
+        }
+        offset = nextOffset;
+        showToast(`Uploading file... ${Math.floor(offset / file.size * 100)}%`, 'warning');
+    }
+}
+
 // Library
 async function loadLibrary() {
     const libraryList = document.getElementById('library-list');
@@ -366,11 +430,66 @@ async function loadJobs() {
             const jobElement = createJobElement(job);
             jobsList.appendChild(jobElement);
         });
+
+        if (jobRefreshInterval) {
+            syncJobStreams();
+        }
     } catch (error) {
         showToast('Failed to load jobs: ' + error.message, 'error');
     }
 }
 
+// Keep one status stream open per active job and close the rest
+function syncJobStreams() {
+    const activeIds = new Set(
+        currentJobs.filter(job => STREAMED_JOB_STATUSES.includes(job.status)).map(job => job.job_id)
+    );
+
+    Object.keys(jobStreams).forEach(jobId => {
+        if (!activeIds.has(jobId)) closeJobStream(jobId);
+    });
+
+    activeIds.forEach(jobId => {
+        if (!jobStreams[jobId]) openJobStream(jobId);
+    });
+}
+
+function openJobStream(jobId) {
+    const source = new EventSource(`/api/status/${encodeURIComponent(jobId)}/stream`);
+
+    source.onmessage = (event) => {
+        const job = JSON.parse(event.data);
+        const existing = document.querySelector(`.job-item[data-job-id="${CSS.escape(jobId)}"]`);
+        if (existing) {
+            existing.replaceWith(createJobElement(job));
+        }
+
+        if (!STREAMED_JOB_STATUSES.includes(job.status)) {
+            closeJobStream(jobId);
+            // A queued job may have taken the freed slot
+            loadJobs();
+        }
+    };
+
+    // The server ends streams periodically and EventSource reconnects on its own.
+    // It only gives up (CLOSED) on an error response such as 404 or 503, in which
+    // case the periodic job list refresh reopens it if the job is still active.
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && jobStreams[jobId] === source) {
+            delete jobStreams[jobId];
+        }
+    };
+
+    jobStreams[jobId] = source;
+}
+
+function closeJobStream(jobId) {
+    if (jobStreams[jobId]) {
+        jobStreams[jobId].close();
+        delete jobStreams[jobId];
+    }
+}
+
 function createJobElement(job) {
     const div = document.createElement('div');
     div.className = 'job-item';
@@ -378,10 +497,12 @@ function createJobElement(job) {
 
     const progress = job.progress || 0;
     const statusClass = `status-${job.status}`;
-    const statusText = job.status.charAt(0).toUpperCase() + job.status.slice(1);
+    const statusText = job.cancel_requested
+        ? 'Cancelling'
+        : job.status.charAt(0).toUpperCase() + job.status.slice(1);
 
     let actionsHTML = '';
-    if (job.status === 'running') {
+    if ((job.status === 'running' && !job.cancel_requested) || job.status === 'pending') {
         actionsHTML = `
             <button class="btn btn-small btn-danger" onclick="cancelJob('${job.job_id}')">Cancel</button>
         `;
@@ -482,7 +603,7 @@ async function cancelJob(jobId) {
         const result = await response.json();
 
         if (response.ok) {
-            showToast('Job cancelled', 'success');
+            showToast(result.status === 'cancelled' ? 'Job cancelled' : 'Cancelling job', 'success');
             loadJobs();
         } else {
             showToast(result.error || 'Failed to cancel job', 'error');
@@ -514,9 +635,11 @@ async function deleteJob(jobId) {
 function startJobRefresh() {
     if (jobRefreshInterval) return;
     
+    // Active jobs are pushed over status streams; the list itself refreshes slowly
     jobRefreshInterval = setInterval(() => {
         loadJobs();
-    }, 2000); // Refresh every 2 seconds
+    }, JOB_LIST_REFRESH_MS);
+    syncJobStreams();
 }
 
 function stopJobRefresh() {
@@ -524,6 +647,7 @@ function stopJobRefresh() {
         clearInterval(jobRefreshInterval);
         jobRefreshInterval = null;
     }
+    Object.keys(jobStreams).forEach(closeJobStream);
 }
 
 // Settings